@@ -3,7 +3,7 @@
 
 import re
 from sys import exit
-from time import sleep
+from time import sleep, time
 from threading import Thread
 from datetime import datetime
 from netmiko import file_transfer
@@ -11,7 +11,7 @@ from argparse import ArgumentParser
 from os import path, mkdir, environ, stat
 from netmiko.exceptions import NetmikoTimeoutException
 from related_utils import remove_old_files, generate_telegram_bot, markdownv2_converter
-from related_utils import generate_connector, allowed_filename, print_output, size_converter
+from related_utils import generate_connector, allowed_filename, print_output, size_converter, export_digest
 
 
 def args_parser():
@@ -24,9 +24,18 @@ def args_parser():
     parser.add_argument('-p', '--path', type=str, help='Path to backups.', required=True)
     parser.add_argument('-t', '--lifetime', type=int, help='Files (backup) lifetime (in days).',
                         required=False)
+    parser.add_argument('-d', '--detect', action='store_true',
+                        help='Skip backup if configuration is unchanged since last backup.', required=False)
+    parser.add_argument('-r', '--refresh', type=int,
+                        help='Forced full backup interval (in days) with --detect.', required=False)
     parser.add_argument('-b', '--bottoken', type=str, help='Telegram Bot token.', required=False)
     parser.add_argument('-c', '--chatid', type=str, help='Telegram chat id.', required=False)
     arguments = parser.parse_args().__dict__
+    if arguments['refresh'] is not None:
+        if not arguments['detect']:
+            parser.error('--refresh requires --detect.')
+        if arguments['refresh'] < 1:
+            parser.error('--refresh must be at least 1 day.')
     return arguments
 
 
@@ -41,7 +50,9 @@ def hosts_to_devices(hosts):
                     ssh_config_file=ssh_config_file,
                     host=hostname,
                     path_to_backups=args_in['path'],
-                    lifetime=args_in['lifetime']
+                    lifetime=args_in['lifetime'],
+                    detect=args_in['detect'],
+                    refresh=args_in['refresh'],
                 )
             except (NetmikoTimeoutException, ValueError) as exc:
                 text = exc.__str__().replace('\n', ' ').replace('  ', ' ')
@@ -53,7 +64,7 @@ def hosts_to_devices(hosts):
     return devices
 
 
-def summary_report(reports, lifetime):
+def summary_report(reports, lifetime, detect=False):
     many_hosts = len(reports) > 1
     ending = {
         True: 'ах',
@@ -63,7 +74,9 @@ def summary_report(reports, lifetime):
     message_header = f'Отчёт о проведении бэкапа настроек на Микротик{ending[many_hosts]}.\n\n'
     message_body = ''
     message_footer = ''
-    if lifetime:
+    if lifetime and detect:
+        message_footer += f'{emoji_dead}Для устройств с новым бэкапом также были удалены ранее сохранённые бэкапы старше {lifetime} дн.'
+    elif lifetime:
         message_footer += f'{emoji_dead}Также были удалены ранее сохранённые бэкапы старше {lifetime} дн.'
     for report in reports:
         message_body += f'{report}\n'
@@ -73,14 +86,17 @@ def summary_report(reports, lifetime):
 
 class Backuper(Thread):
 
-    def __init__(self, host, path_to_backups, ssh_config_file, lifetime, *args, **kwargs):
+    def __init__(self, host, path_to_backups, ssh_config_file, lifetime, detect=False, refresh=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.path_to_backups = path_to_backups
         self.connect = generate_connector(
             args={'sshconf': ssh_config_file, 'host': host},
         )
         self.lifetime = lifetime
+        self.detect = detect
+        self.refresh = refresh
         self.subdir = 'backup'
+        self.digest_file = '.export.sha256'
         self.delay = 10
         self.report = ''
         self.emoji = {
@@ -88,6 +104,7 @@ class Backuper(Thread):
             'dir':      '\U0001F4C2',       # 📂
             'ok':       '\U00002705',       # ✅
             'not ok':   '\U0000274C',       # ❌
+            'same':     '\U0001F504',       # 🔄
         }
 
     def run(self):
@@ -95,13 +112,23 @@ class Backuper(Thread):
         identity = self.generate_identity()
         path_to_backup = path.join(self.path_to_backups, identity)
         backup_name = f'{identity}_{datetime.now().strftime("%Y.%m.%d_%H.%M.%S")}'
+        if self.detect:
+            digest = export_digest(self.connect.send_command('/export', read_timeout=240))
+            if not self.backup_needed(digest, path_to_backup):
+                text = markdownv2_converter('Конфигурация не изменилась с последнего бэкапа.')
+                self.add_to_report(f'{self.emoji["same"]}{text}')
+                self.connect.disconnect()
+                return
         self.make_dirs(path_to_backup)
         self.create_backup(backup_name)
         sleep(self.delay)
         self.add_to_report(f'В каталоге {self.emoji["dir"]}`{markdownv2_converter(path_to_backup)}/` сохранены файлы:')
+        downloaded = []
         for backup_type in ['rsc', 'backup']:
-            self.download_backup(backup_type, backup_name, path_to_backup)
+            downloaded.append(self.download_backup(backup_type, backup_name, path_to_backup))
             self.remove_backup_from_device(backup_type, backup_name)
+        if self.detect and all(downloaded):
+            self.save_digest(digest, path_to_backup)
         sleep(self.delay)
         self.connect.disconnect()
         if self.lifetime:
@@ -118,6 +145,22 @@ class Backuper(Thread):
         allowed_identity_name = allowed_filename(identity_name)
         return allowed_identity_name
 
+    def backup_needed(self, digest, path_to_backup):
+        digest_path = path.join(path_to_backup, self.digest_file)
+        try:
+            with open(digest_path) as file:
+                last_digest = file.read().strip()
+            last_backup = stat(digest_path).st_mtime
+        except FileNotFoundError:
+            return True
+        if self.refresh and time() - last_backup > self.refresh * 60 * 60 * 24:
+            return True
+        return digest != last_digest
+
+    def save_digest(self, digest, path_to_backup):
+        with open(path.join(path_to_backup, self.digest_file), 'w') as file:
+            file.write(f'{digest}\n')
+
     def make_dirs(self, path_to_backup):
         try:
             mkdir(path_to_backup)
@@ -163,11 +206,14 @@ class Backuper(Thread):
             file_stats = stat(dst_file)
         except FileNotFoundError:
             file_info = f'{self.emoji["not ok"]}`{file_name}`'
+            downloaded = False
         else:
             file_size = markdownv2_converter(size_converter(file_stats.st_size))
             file_name = markdownv2_converter(src_file)
             file_info = f'{self.emoji["ok"]}`{file_name}` ➜ {file_size}'
+            downloaded = True
         self.add_to_report(file_info)
+        return downloaded
 
     def remove_backup_from_device(self, backup_type, backup_name):
         self.connect.send_command(f'/file remove {self.subdir}/{backup_name}.{backup_type}')
@@ -213,7 +259,7 @@ def main():
         devices_reports = []
         for device in devices_backup:
             devices_reports.append(device.report)
-        report = summary_report(devices_reports, args_in['lifetime'])
+        report = summary_report(devices_reports, args_in['lifetime'], args_in['detect'])
         telegram_bot.send_text_message(report)
 
 
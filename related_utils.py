@@ -3,6 +3,7 @@
 
 import os
 import re
+import hashlib
 import ipaddress
 import routeros_api
 from ipwhois.net import Net
@@ -144,6 +145,13 @@ def allowed_filename(filename):
     return allowed_name
 
 
+def export_digest(export):
+    # Comment lines carry the export timestamp and RouterOS version, skip them
+    lines = [line.rstrip() for line in export.splitlines() if line.strip() and not line.startswith('#')]
+    digest = hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+    return digest
+
+
 def print_output(device, command, delay=1, timeout=60):
     output = device.send_command(command, expect_string=r'[$>]', read_timeout=timeout)
     sleep(delay)